@@ -3,8 +3,9 @@ import { auth } from './auth/resource';
 import { data } from './data/resource';
 import { sayHelloFunctionHandler } from './functions/say-hello/resource';
 import { earthaccessFunctionHandler } from './functions/earthaccess/resource';
-import * as iam from 'aws-cdk-lib/aws-iam';
-import { Stack, ArnFormat } from 'aws-cdk-lib';
+import * as sqs from 'aws-cdk-lib/aws-sqs';
+import { SqsEventSource } from 'aws-cdk-lib/aws-lambda-event-sources';
+import { Duration, Stack } from 'aws-cdk-lib';
 
 
 /**
@@ -30,18 +31,38 @@ if (earthAccessJobTable) {
     earthAccessJobTable.tableName
   );
   
-  // Grant Lambda permission to invoke itself (for async processing)
-  // Use formatArn with wildcard to avoid circular dependency
+  // Queue between startEarthAccessJob and the async worker, consumed by the
+  // same Lambda. Failed deliveries are retried by SQS and end up in the DLQ.
   const stack = Stack.of(lambdaFunction);
-  const functionArnPattern = stack.formatArn({
-    service: 'lambda',
-    resource: 'function',
-    resourceName: '*earthaccess*',  // Match any function with 'earthaccess' in the name
-    arnFormat: ArnFormat.COLON_RESOURCE_NAME,
+  const jobDeadLetterQueue = new sqs.Queue(stack, 'EarthAccessJobDeadLetterQueue', {
+    retentionPeriod: Duration.days(14),
   });
-  
-  (lambdaFunction as any).addToRolePolicy(new iam.PolicyStatement({
-    actions: ['lambda:InvokeFunction'],
-    resources: [functionArnPattern],
+  const functionTimeout: Duration = (lambdaFunction as any).timeout;
+  const jobQueue = new sqs.Queue(stack, 'EarthAccessJobQueue', {
+    // AWS recommends 6x the function timeout for Lambda event sources
+    visibilityTimeout: Duration.seconds(functionTimeout.toSeconds() * 6),
+    deadLetterQueue: {
+      queue: jobDeadLetterQueue,
+      maxReceiveCount: 3,
+    },
+  });
+  jobQueue.grantSendMessages(lambdaFunction);
+  (lambdaFunction as any).addEventSource(new SqsEventSource(jobQueue, {
+    batchSize: 1, // one long-running job per invocation
+    maxConcurrency: 10, // caps concurrent 4 GB workers, e.g. during a per-year fan-out
+  }));
+  (lambdaFunction as any).addEnvironment(
+    "JOB_QUEUE_URL",
+    jobQueue.queueUrl
+  );
+
+  // Messages that exhausted their retries (e.g. repeated timeouts) come back
+  // through the dead-letter queue so the handler can mark their job failed
+  (lambdaFunction as any).addEventSource(new SqsEventSource(jobDeadLetterQueue, {
+    batchSize: 1,
   }));
+  (lambdaFunction as any).addEnvironment(
+    "JOB_DEAD_LETTER_QUEUE_ARN",
+    jobDeadLetterQueue.queueArn
+  );
 }
\ No newline at end of file
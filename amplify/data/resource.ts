@@ -12,11 +12,15 @@ const schema = a.schema({
   // DynamoDB table to store long-running job results
   EarthAccessJob: a.model({
     jobId: a.id().required(),
-    status: a.string().required(), // 'pending', 'processing', 'completed', 'failed'
+    status: a.string().required(), // 'pending', 'completed', 'failed'
     lat: a.float().required(),
     long: a.float().required(),
     date: a.string().required(),
     timezone: a.string().required(),
+    yearsBack: a.integer(),
+    yearsTotal: a.integer(), // set when a long job is split into per-year workers
+    yearResults: a.json(), // per-year noon averages of a split job, keyed by date
+    yearErrors: a.json(),
     result: a.json(),
     error: a.string(),
     createdAt: a.datetime(),
@@ -52,6 +56,7 @@ const schema = a.schema({
       long: a.float(),
       date: a.date(),
       timezone: a.string(),
+      yearsBack: a.integer(), // optional, defaults to 5; long ranges fan out per year
     })
     .returns(a.string()) // Returns job ID
     .authorization((allow) => [allow.guest()])
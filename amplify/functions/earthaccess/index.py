@@ -1,40 +1,204 @@
+import calendar
+import contextlib
+import functools
 import json
+import logging
 import os
+import shutil
 import uuid
+import threading
+import time
 import boto3
-from datetime import datetime, date
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import UTC, datetime, date
 from decimal import Decimal
 
 import earthaccess
+import fsspec
 import xarray as xr
 import pandas as pd
 import numpy as np
 
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+class JobFailedError(Exception):
+    """A worker failure that has already been recorded on the job"""
+
+
 # Initialize AWS clients
 dynamodb = boto3.resource('dynamodb')
-lambda_client = boto3.client('lambda')
+sqs_client = boto3.client('sqs')
+
+# Small shared pool for independent AWS calls on the request path
+_request_executor = ThreadPoolExecutor(max_workers=2)
+
+# SendMessageBatch accepts at most this many entries per call
+SQS_BATCH_SIZE = 10
+
+# Async workers can in principle race the job's put_item, so conditional
+# updates of a pending job are retried briefly before giving up
+PENDING_UPDATE_ATTEMPTS = 5
+PENDING_UPDATE_RETRY_DELAY = 0.2
+
+# DynamoDB Table resources, reused across warm invocations
+_TABLE_CACHE = {}
+
+
+def _table(name):
+    table = _TABLE_CACHE.get(name)
+    if table is None:
+        table = _TABLE_CACHE.setdefault(name, dynamodb.Table(name))
+    return table
+
+# Earthdata login state, kept for the lifetime of the (warm) container
+_LOGGED_IN = False
+
+
+def _ensure_login():
+    global _LOGGED_IN
+    if not _LOGGED_IN:
+        earthaccess.login(strategy='environment')
+        _LOGGED_IN = True
+
+
+# Block-cached HTTPS filesystem for granule reads. Lambda's /tmp survives warm
+# invocations, so HDF5 metadata blocks fetched once are reused across years/jobs.
+# /tmp is sized to 2 GiB in resource.ts: the cache is cleared between invocations
+# once it passes CACHE_MAX_BYTES, and granules opened while it is over the cap
+# bypass it, leaving the other half for blocks written by in-flight granules.
+CACHE_STORAGE = '/tmp/fsspec'
+CACHE_BLOCK_SIZE = 8 * 1024 * 1024
+CACHE_MAX_BYTES = 1024 * 1024 * 1024
+_cached_fs = None
+_cached_fs_lock = threading.Lock()
+
+# MERRA-2 M2T1NXSLV granules hold 24 hourly time steps; only noon is used
+NOON_HOUR_INDEX = 12
+
+VARIABLES = [
+    'T2M',      # 2-meter air temperature (K)
+    'PS',       # Surface pressure (Pa)
+    'QV2M',     # 2-meter specific humidity (kg/kg)
+    'U2M',      # 2-meter eastward wind (m/s)
+    'V2M'       # 2-meter northward wind (m/s)
+]
+
+# Async jobs average this many years unless the request asks for more
+DEFAULT_YEARS_BACK = 5
+# Jobs covering at least this many years are split into one async
+# invocation per year instead of fetching every year in a single worker
+FAN_OUT_MIN_YEARS = 10
+# MERRA-2 coverage starts in 1980, which bounds how far back a job can go
+MERRA2_FIRST_YEAR = 1980
+
+
+def get_cached_fs():
+    """Return the shared block-cached filesystem (requires _ensure_login first)"""
+    global _cached_fs
+    with _cached_fs_lock:
+        if _cached_fs is None:
+            https_fs = earthaccess.get_fsspec_https_session()
+            _cached_fs = fsspec.filesystem(
+                'blockcache',
+                fs=https_fs,
+                cache_storage=CACHE_STORAGE,
+                skip_instance_cache=True,
+            )
+    return _cached_fs
+
+
+def _cache_size(path):
+    """Bytes actually allocated under path (block cache files are sparse)"""
+    total = 0
+    for root, _, files in os.walk(path):
+        for name in files:
+            try:
+                total += os.stat(os.path.join(root, name)).st_blocks * 512
+            except FileNotFoundError:
+                continue
+    return total
+
+
+def trim_cache():
+    """
+    Clear the block cache once it outgrows CACHE_MAX_BYTES. Called at the start
+    of an invocation that reads granules, before any granule is open.
+    """
+    global _cached_fs
+    with _cached_fs_lock:
+        if _cache_size(CACHE_STORAGE) <= CACHE_MAX_BYTES:
+            return
+        logger.info("Clearing fsspec block cache in %s", CACHE_STORAGE)
+        shutil.rmtree(CACHE_STORAGE, ignore_errors=True)
+        # the filesystem's cache metadata points at the removed files
+        _cached_fs = None
+
+
+def _utc_timestamp():
+    """Timezone-aware UTC timestamp at second precision for job records"""
+    return datetime.now(UTC).isoformat(timespec='seconds')
+
+
+def _convert_nested(obj, leaf_type, convert):
+    """
+    Copy nested dicts/lists with an explicit stack instead of recursion,
+    applying convert to every leaf_type value
+    """
+    root = {} if type(obj) is dict else [None] * len(obj)
+    stack = deque([(obj, root)])
+    while stack:
+        src, dst = stack.pop()
+        for key, value in (src.items() if type(src) is dict else enumerate(src)):
+            value_type = type(value)
+            if value_type is dict:
+                dst[key] = child = {}
+                stack.append((value, child))
+            elif value_type is list:
+                dst[key] = child = [None] * len(value)
+                stack.append((value, child))
+            elif isinstance(value, leaf_type):
+                dst[key] = convert(value)
+            else:
+                dst[key] = value
+
+    return root
+
+
+def _float_to_decimal(value):
+    # go through str so DynamoDB gets the short repr, not the exact binary expansion
+    return Decimal(str(value))
 
 
 def convert_floats_to_decimal(obj):
     """Convert float values to Decimal for DynamoDB compatibility"""
-    if isinstance(obj, float):
-        return Decimal(str(obj))
-    elif isinstance(obj, dict):
-        return {k: convert_floats_to_decimal(v) for k, v in obj.items()}
-    elif isinstance(obj, list):
-        return [convert_floats_to_decimal(item) for item in obj]
-    return obj
+    obj_type = type(obj)
+    if obj_type is dict:
+        if all(type(v) is float for v in obj.values()):
+            return {k: _float_to_decimal(v) for k, v in obj.items()}
+    elif obj_type is not list:
+        return _float_to_decimal(obj) if isinstance(obj, float) else obj
+    return _convert_nested(obj, float, _float_to_decimal)
 
 
 def convert_decimals_to_float(obj):
     """Convert Decimal values back to float for JSON serialization"""
-    if isinstance(obj, Decimal):
-        return float(obj)
-    elif isinstance(obj, dict):
-        return {k: convert_decimals_to_float(v) for k, v in obj.items()}
-    elif isinstance(obj, list):
-        return [convert_decimals_to_float(item) for item in obj]
-    return obj
+    obj_type = type(obj)
+    if obj_type is dict:
+        # Fast path for flat maps of numbers, e.g. a stored job result
+        if all(type(v) is Decimal for v in obj.values()):
+            return {k: float(v) for k, v in obj.items()}
+    elif obj_type is not list:
+        return float(obj) if obj_type is Decimal else obj
+    return _convert_nested(obj, Decimal, float)
+
+
+def window_slice(coords, center, buffer):
+    """Integer slice covering center +/- buffer (inclusive) on an ascending coordinate"""
+    start = int(np.searchsorted(coords, center - buffer))
+    stop = int(np.searchsorted(coords, center + buffer, side='right'))
+    return slice(start, stop)
 
 
 def pull_data(date, latitude, longitude, keep_variables=[], buffer=0.5, subset=True):
@@ -47,36 +211,125 @@ def pull_data(date, latitude, longitude, keep_variables=[], buffer=0.5, subset=T
         count=1
     )
 
-    # load data
-    fn = earthaccess.open(results)  # downloading the data, authentication
-    print(fn)
-    ds = xr.open_mfdataset(fn)  # opens file(s) and combines into single xarray dataset
-    print('completed loading data')
-    
-    # subset by latitude/longitude and by variables
-    if subset:
-        ds = ds.sel(
-            lat=slice(latitude - buffer, latitude + buffer),
-            lon=slice(longitude - buffer, longitude + buffer)
-        )
-    if keep_variables:
-        ds = ds[keep_variables]
-    
+    # load data; the granule handles and fsspec buffers are released on the
+    # way out, whether or not the subset loads
+    cached_fs = get_cached_fs()
+    urls = [r.data_links()[0] for r in results]
+    with contextlib.ExitStack() as stack:
+        fn = []
+        for u in urls:
+            # the cache can't be cleared under open granules, so once it is
+            # full read straight over HTTPS until the next invocation trims it
+            granule_fs = cached_fs if _cache_size(CACHE_STORAGE) <= CACHE_MAX_BYTES else cached_fs.fs
+            fn.append(stack.enter_context(granule_fs.open(u, block_size=CACHE_BLOCK_SIZE)))
+        logger.debug("opened %d granules", len(fn))
+        # open lazily (dask-backed) so only the subset selected below is actually read.
+        # Skip CF decoding: time is selected by position, the M2T1NXSLV
+        # variables are unpacked SI values, and fill values are masked in
+        # extract_noon_averages.
+        source = stack.enter_context(xr.open_mfdataset(
+            fn,
+            chunks={},
+            engine='h5netcdf',
+            parallel=True,
+            combine='by_coords',
+            decode_cf=False
+        ))
+        logger.debug('completed loading data')
+        
+        # drop unused variables and auxiliary coordinates before subsetting
+        ds = source.reset_coords(drop=True)
+        if keep_variables:
+            ds = ds[keep_variables]
+
+        # subset by latitude/longitude
+        if subset:
+            # MERRA-2 lat/lon are regular ascending grids, so positional slices
+            # give the same inclusive window as .sel without label lookups
+            ds = ds.isel(
+                lat=window_slice(ds.lat.values, latitude, buffer),
+                lon=window_slice(ds.lon.values, longitude, buffer)
+            )
+        # only the noon time step is used downstream, so skip reading the other 23
+        ds = ds.isel(time=NOON_HOUR_INDEX)
+
+        # materialize only the selected window and variables in one pass; load()
+        # submits every variable to a single dask.compute, so reads of the shared
+        # granule are batched rather than issued per variable
+        ds = ds.load(scheduler='threads', num_workers=4)
+
     return ds
 
-def extract_hourly_averages(ds):
-    print(f"Extracting hourly averages...")
-    hourly_data = {}
+def extract_noon_averages(ds):
+    logger.debug("Extracting noon averages...")
+    noon_values = {}
     for var in ds.data_vars:
-        # Average across lat and lon dimensions, keeping time dimension
-        hourly_data[var] = ds[var].mean(dim=['lat', 'lon']).values
-    
-    return hourly_data
+        # Average across lat and lon (time is already reduced to noon). Put the
+        # window in C order and flatten it so numpy does one contiguous reduction;
+        # nanmean keeps the NaN skipping xarray's mean did.
+        arr = ds[var].transpose('lat', 'lon').values.reshape(-1)
+        # CF decoding is skipped on open, so mask raw fill values here
+        for attr in ('_FillValue', 'missing_value'):
+            fill_value = ds[var].attrs.get(attr)
+            if fill_value is not None:
+                arr = np.where(arr == fill_value, np.nan, arr)
+        noon_values[var] = np.nanmean(arr).item()
+
+    return noon_values
+
+
+def fetch_noon_averages(date, latitude, longitude, keep_variables=[], buffer=0.5, subset=True):
+    """
+    Pull one day's data and reduce it to per-variable noon averages, so only
+    the scalars outlive the call (pull_data has already released the granule)
+    """
+    return extract_noon_averages(pull_data(date, latitude, longitude, keep_variables, buffer, subset))
+
+
+def stack_noon_averages(all_noon_values, variables):
+    """
+    Copy per-year noon averages into a single (years, variables) buffer
+    so cross-year means are one reduction
+    """
+    buf = np.empty((len(all_noon_values), len(variables)), dtype=np.float32)
+    for i, noon_values in enumerate(all_noon_values):
+        for j, var in enumerate(variables):
+            buf[i, j] = noon_values[var]
 
+    return buf
 
+
+def average_noon_values(all_noon_values, variables):
+    """
+    Average noon values across years for all variables in one reduction,
+    writing into a preallocated float32 result instead of a temporary
+    """
+    noon_buf = stack_noon_averages(all_noon_values, variables)
+    noon = np.empty(len(variables), dtype=np.float32)
+    return noon_buf.mean(axis=0, out=noon)
+
+
+def validate_years_back(date_str, years_back):
+    """
+    Check a requested yearsBack against MERRA-2 coverage for date_str and
+    return it as an int; raises ValueError if it is out of range
+    """
+    max_years_back = date.fromisoformat(date_str).year - MERRA2_FIRST_YEAR
+    if type(years_back) is not int or not 1 <= years_back <= max_years_back:
+        raise ValueError(
+            f"yearsBack must be an integer from 1 to {max_years_back} for {date_str} "
+            f"(MERRA-2 starts in {MERRA2_FIRST_YEAR}), got {years_back!r}"
+        )
+    if not generate_date_range(date_str, years_back):
+        # Feb 29 only recurs in leap years, so short ranges can be empty
+        raise ValueError(f"yearsBack {years_back} covers no {date_str[5:]} dates before {date_str}")
+    return years_back
+
+
+@functools.lru_cache(maxsize=128)
 def generate_date_range(date_str, years_back=10):
     # Parse the input date
-    input_date = datetime.strptime(date_str, '%Y-%m-%d').date()
+    input_date = date.fromisoformat(date_str)
     month = input_date.month
     day = input_date.day
     
@@ -84,128 +337,345 @@ def generate_date_range(date_str, years_back=10):
     
     # Go back the specified number of years from the input date
     for year in range(input_date.year - years_back, input_date.year):
-        try:
-            # Create date object to validate month/day combination
-            date_obj = date(year, month, day)
-            dates.append(date_obj.strftime('%Y-%m-%d'))
-        except ValueError:
-            # Handle leap year edge cases (e.g., Feb 29)
-            # Skip invalid dates
+        # Skip Feb 29 in non-leap years
+        if month == 2 and day == 29 and not calendar.isleap(year):
             continue
+        dates.append(date(year, month, day).isoformat())
     
-    return dates
+    # tuple so the cached value can't be mutated by callers
+    return tuple(dates)
 
 def pull_multi_year_data(date_str, latitude, longitude, keep_variables=[], buffer=0.5, years_back=10, subset=True):
     # Generate date range
     dates = generate_date_range(date_str, years_back)
-    print(f"Pulling data for {len(dates)} years: {dates[0]} to {dates[-1]}")
+    if not dates:
+        raise ValueError(f"No dates to pull for {date_str} with years_back={years_back}")
+    logger.info("Pulling data for %d years: %s to %s", len(dates), dates[0], dates[-1])
     
-    all_datasets = []
-    for i, date_str in enumerate(dates):
-        print(f"Processing year {i+1}/{len(dates)}: {date_str}")
-        try:
-            ds = pull_data(date_str, latitude, longitude, keep_variables, buffer, subset)
-            all_datasets.append(ds)
-            print(f"  Successfully loaded data for {date_str}")
-        except Exception as e:
-            print(f"  Error loading data for {date_str}: {str(e)}")
-            continue
-    
-    if not all_datasets:
+    # Each year is an independent, network-bound fetch, so run them concurrently.
+    # _ensure_login() must already have been called by the caller.
+    results = {}
+    with ThreadPoolExecutor(max_workers=min(len(dates), 10)) as executor:
+        futures = {
+            executor.submit(fetch_noon_averages, d, latitude, longitude, keep_variables, buffer, subset): d
+            for d in dates
+        }
+        for future in as_completed(futures):
+            d = futures[future]
+            try:
+                results[d] = future.result()
+                logger.debug("  Successfully loaded data for %s", d)
+            except Exception as e:
+                logger.warning("  Error loading data for %s: %s", d, e)
+                continue
+
+    # Preserve chronological order regardless of completion order
+    all_noon_values = [results[d] for d in dates if d in results]
+
+    if not all_noon_values:
         raise ValueError("No data could be loaded for any of the specified dates")
     
-    return all_datasets
+    return all_noon_values
 
 
 
-def process_earth_data(job_id, date_str, lat, lon, timezone, table_name):
+def update_pending_job(table, job_id, update_expression, attribute_names, attribute_values, condition=None):
     """
-    Long-running process - fetches and processes Earth data
-    Updates DynamoDB with results when complete
+    Conditionally update a job that is still pending (and matches condition,
+    if given), retrying only while the job record has not been written yet.
+    Returns False without updating if the job exists but doesn't qualify.
+    """
+    condition_expression = 'attribute_exists(jobId) AND #status = :pending'
+    if condition:
+        condition_expression = f'{condition_expression} AND {condition}'
+    conditional_check_failed = table.meta.client.exceptions.ConditionalCheckFailedException
+    for attempt in range(1, PENDING_UPDATE_ATTEMPTS + 1):
+        try:
+            table.update_item(
+                Key={'jobId': job_id},
+                ReturnValues='NONE',
+                ReturnValuesOnConditionCheckFailure='ALL_OLD',
+                UpdateExpression=update_expression,
+                ConditionExpression=condition_expression,
+                ExpressionAttributeNames={'#status': 'status', **attribute_names},
+                ExpressionAttributeValues={':pending': 'pending', **attribute_values}
+            )
+            return True
+        except conditional_check_failed as e:
+            item = e.response.get('Item')
+            if item is not None:
+                logger.info("Job %s not updated (status: %s)", job_id, item.get('status', {}).get('S'))
+                return False
+            if attempt == PENDING_UPDATE_ATTEMPTS:
+                raise
+            logger.debug("Job %s not pending yet, retrying (%d/%d)", job_id, attempt, PENDING_UPDATE_ATTEMPTS)
+            time.sleep(PENDING_UPDATE_RETRY_DELAY * attempt)
+
+
+def complete_job(table, job_id, noon_data):
+    """Mark a pending job completed with its result. Returns False if it had already finished."""
+    return update_pending_job(
+        table,
+        job_id,
+        'SET #status = :status, #result = :result, completedAt = :completedAt',
+        {'#result': 'result'},
+        {
+            ':status': 'completed',
+            ':result': noon_data,
+            ':completedAt': _utc_timestamp()
+        }
+    )
+
+
+def fail_job(table, job_id, error):
+    """
+    Mark a pending job failed with the given error. A job that is missing or
+    already finished is left untouched.
     """
-    table = dynamodb.Table(table_name)
-    
     try:
-        # Update status to processing
         table.update_item(
             Key={'jobId': job_id},
-            UpdateExpression='SET #status = :status',
-            ExpressionAttributeNames={'#status': 'status'},
-            ExpressionAttributeValues={':status': 'processing'}
-        )
-        
-        earthaccess.login(strategy='environment')
-        
-        variables = [
-            'T2M',      # 2-meter air temperature (K)
-            'PS',       # Surface pressure (Pa)
-            'QV2M',     # 2-meter specific humidity (kg/kg)
-            'U2M',      # 2-meter eastward wind (m/s)
-            'V2M'       # 2-meter northward wind (m/s)
-        ]
-
-        # Process 5 years of data (no timeout constraint in async mode)
-        all_datasets = pull_multi_year_data(date_str, lat, lon, keep_variables=variables, years_back=5)
-        all_hourly_data = []
-        for i, ds in enumerate(all_datasets):
-            hourly_data = extract_hourly_averages(ds)
-            all_hourly_data.append(hourly_data)
-
-        # Average across years for each variable
-        averaged_hourly_data = {}
-        for var in all_hourly_data[0].keys():
-            arrays = [data[var] for data in all_hourly_data]
-            stacked = np.stack(arrays)
-            averaged_hourly_data[var] = np.mean(stacked, axis=0)
-
-        # Extract noon data
-        noon_hour_index = 12
-        noon_data = {}
-        for var, values in averaged_hourly_data.items():
-            noon_data[var] = Decimal(str(float(values[noon_hour_index])))
-
-        # Update DynamoDB with completed results
-        table.update_item(
-            Key={'jobId': job_id},
-            UpdateExpression='SET #status = :status, #result = :result, completedAt = :completedAt',
+            ReturnValues='NONE',
+            UpdateExpression='SET #status = :status, #error = :error, completedAt = :completedAt',
+            ConditionExpression='attribute_exists(jobId) AND #status = :pending',
             ExpressionAttributeNames={
                 '#status': 'status',
-                '#result': 'result'
+                '#error': 'error'
             },
             ExpressionAttributeValues={
-                ':status': 'completed',
-                ':result': noon_data,
-                ':completedAt': datetime.utcnow().isoformat()
+                ':status': 'failed',
+                ':pending': 'pending',
+                ':error': str(error),
+                ':completedAt': _utc_timestamp()
             }
         )
+    except table.meta.client.exceptions.ConditionalCheckFailedException:
+        logger.warning("Job %s is missing or no longer pending; not marking it failed", job_id)
+
+
+def fan_out_years(table, job_id, date_str, lat, lon, timezone, table_name, years_back, queue_url):
+    """
+    Split a job into one queued worker message per year. Each year worker
+    records its result on the job item; the worker that completes the set
+    aggregates them (see process_year).
+    """
+    dates = generate_date_range(date_str, years_back)
+    if not dates:
+        raise ValueError("No dates to process for the requested range")
+
+    # yearsTotal marks the job as fanned out, so a redelivered processJob
+    # message doesn't queue every year again
+    fanned_out = update_pending_job(
+        table,
+        job_id,
+        'SET yearsTotal = :total, yearResults = :empty, yearErrors = :empty',
+        {},
+        {':total': len(dates), ':empty': {}},
+        condition='attribute_not_exists(yearsTotal)'
+    )
+    if not fanned_out:
+        return
+
+    messages = [
+        {
+            'Id': str(i),
+            'MessageBody': json.dumps({
+                'processYear': True,
+                'jobId': job_id,
+                'date': year_date,
+                'lat': lat,
+                'long': lon,
+                'timezone': timezone,
+                'tableName': table_name
+            })
+        }
+        for i, year_date in enumerate(dates)
+    ]
+    for i in range(0, len(messages), SQS_BATCH_SIZE):
+        response = sqs_client.send_message_batch(QueueUrl=queue_url, Entries=messages[i:i + SQS_BATCH_SIZE])
+        if response.get('Failed'):
+            raise RuntimeError(f"Failed to queue {len(response['Failed'])} year workers for job {job_id}")
+    logger.info("Job %s fanned out to %d year workers", job_id, len(dates))
+
+
+def record_year(table, job_id, year_date, noon_values=None, error=None):
+    """
+    Record one year's noon averages (or its error) on a fanned-out job,
+    keyed by date so a redelivered year overwrites rather than double counts.
+    Returns the updated job, or None if the job is no longer pending.
+    """
+    if error is None:
+        update_expression = 'SET yearResults.#date = :value'
+        value = {var: Decimal(repr(float(noon_values[var]))) for var in VARIABLES}
+    else:
+        update_expression = 'SET yearErrors.#date = :value'
+        value = str(error)
+    try:
+        response = table.update_item(
+            Key={'jobId': job_id},
+            UpdateExpression=update_expression,
+            ConditionExpression='attribute_exists(yearsTotal) AND #status = :pending',
+            ExpressionAttributeNames={'#status': 'status', '#date': year_date},
+            ExpressionAttributeValues={':pending': 'pending', ':value': value},
+            ReturnValues='ALL_NEW'
+        )
+    except table.meta.client.exceptions.ConditionalCheckFailedException:
+        logger.info("Job %s is no longer pending; dropping year %s", job_id, year_date)
+        return None
+    return response['Attributes']
+
+
+def aggregate_years(table, job):
+    """Average the per-year results of a fanned-out job and complete it"""
+    job_id = job['jobId']
+
+    # only one worker may aggregate, even if several see every year reported
+    claimed = update_pending_job(
+        table,
+        job_id,
+        'SET aggregating = :true',
+        {},
+        {':true': True},
+        condition='attribute_not_exists(aggregating)'
+    )
+    if not claimed:
+        return
+
+    # years that failed to load have no result and are left out of the mean
+    year_results = list(job['yearResults'].values())
+    if not year_results:
+        raise ValueError("No data could be loaded for any of the specified dates")
+
+    noon = average_noon_values([convert_decimals_to_float(result) for result in year_results], VARIABLES)
+    if complete_job(table, job_id, {var: Decimal(repr(float(value))) for var, value in zip(VARIABLES, noon)}):
+        logger.info("Job %s completed successfully", job_id)
+
+
+def process_year(job_id, year_date, lat, lon, timezone, table_name):
+    """
+    Fanned-out worker - fetches a single year, records its noon averages on
+    the job and aggregates the job once every year has reported
+    """
+    table = _table(table_name)
+
+    # a login failure is not a bad year: let it propagate so SQS retries the message
+    _ensure_login()
+    noon_values, error = None, None
+    try:
+        noon_values = fetch_noon_averages(year_date, lat, lon, keep_variables=VARIABLES)
+    except Exception as e:
+        # match the single-worker path: a bad year is skipped, not fatal
+        logger.warning("  Error loading data for %s: %s", year_date, e)
+        error = e
+
+    job = record_year(table, job_id, year_date, noon_values=noon_values, error=error)
+    finish_year(table, job_id, job)
+
+
+def finish_year(table, job_id, job):
+    """Aggregate a fanned-out job once the year just recorded completes the set"""
+    if job is None:
+        return
+    reported = set(job['yearResults']) | set(job['yearErrors'])
+    if len(reported) < job['yearsTotal']:
+        return
+
+    try:
+        aggregate_years(table, job)
+    except Exception as e:
+        fail_job(table, job_id, e)
+        logger.error("Job %s failed: %s", job_id, e)
+        raise JobFailedError(str(e)) from e
+
+
+def process_earth_data(job_id, date_str, lat, lon, timezone, table_name,
+                       years_back=DEFAULT_YEARS_BACK, queue_url=None):
+    """
+    Long-running process - fetches and processes Earth data
+    Updates DynamoDB with results when complete
+    Long ranges are fanned out to per-year workers when queue_url is given
+    """
+    table = _table(table_name)
+    
+    try:
+        if years_back >= FAN_OUT_MIN_YEARS and queue_url:
+            fan_out_years(table, job_id, date_str, lat, lon, timezone, table_name, years_back, queue_url)
+            return
+
+        # The job stays 'pending' while this worker runs; the only write on
+        # success is the final conditional transition to 'completed' below.
+        _ensure_login()
         
-        print(f"Job {job_id} completed successfully")
+        # No timeout constraint in async mode
+        all_noon_values = pull_multi_year_data(date_str, lat, lon, keep_variables=VARIABLES, years_back=years_back)
+        noon = average_noon_values(all_noon_values, VARIABLES)
+        noon_data = {var: Decimal(repr(float(value))) for var, value in zip(VARIABLES, noon)}
+
+        # Update DynamoDB with completed results (only moves a pending job forward)
+        if complete_job(table, job_id, noon_data):
+            logger.info("Job %s completed successfully", job_id)
         
     except Exception as e:
         # Update DynamoDB with error
-        table.update_item(
-            Key={'jobId': job_id},
-            UpdateExpression='SET #status = :status, #error = :error, completedAt = :completedAt',
-            ExpressionAttributeNames={
-                '#status': 'status',
-                '#error': 'error'
-            },
-            ExpressionAttributeValues={
-                ':status': 'failed',
-                ':error': str(e),
-                ':completedAt': datetime.utcnow().isoformat()
-            }
+        fail_job(table, job_id, e)
+        logger.error("Job %s failed: %s", job_id, e)
+        raise JobFailedError(str(e)) from e
+
+
+def process_worker_message(message, queue_url):
+    """
+    Run one worker message - either a whole job or a single fanned-out year
+    """
+    trim_cache()
+    if message.get('processJob'):
+        logger.info("Processing job asynchronously: %s", message.get('jobId'))
+        process_earth_data(
+            message['jobId'],
+            message['date'],
+            message['lat'],
+            message['long'],
+            message['timezone'],
+            message['tableName'],
+            years_back=message.get('yearsBack', DEFAULT_YEARS_BACK),
+            queue_url=queue_url
         )
-        print(f"Job {job_id} failed: {str(e)}")
-        raise
+    elif message.get('processYear'):
+        # Fanned-out worker for a single year of a long job
+        logger.info("Processing year %s for job %s", message.get('date'), message.get('jobId'))
+        process_year(
+            message['jobId'],
+            message['date'],
+            message['lat'],
+            message['long'],
+            message['timezone'],
+            message['tableName']
+        )
+    else:
+        raise ValueError(f"Unknown worker message. Keys: {list(message.keys())}")
+
+
+def process_dead_letter(message):
+    """
+    Resolve a worker message SQS gave up on after repeated failures or
+    timeouts, so pollers don't wait on the job forever
+    """
+    table = _table(message['tableName'])
+    error = "Worker gave up after repeated failures or timeouts"
+    if message.get('processYear'):
+        job = record_year(table, message['jobId'], message['date'], error=error)
+        finish_year(table, message['jobId'], job)
+    else:
+        fail_job(table, message['jobId'], error)
+        logger.error("Job %s failed: %s", message['jobId'], error)
 
 
 def handler(event, context):
     """
     Main handler - routes to appropriate function based on query type
     """
-    print(f"Event received: {json.dumps(event, default=str)}")
-    print(f"Event keys: {list(event.keys())}")
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug("Event received: %s", json.dumps(event, default=str))
+        logger.debug("Event keys: %s", list(event.keys()))
     
     # Get the field name (query type) from the event
     # Try multiple possible locations for field name
@@ -217,85 +687,101 @@ def handler(event, context):
     if not field_name:
         field_name = event.get('operation', '')
     
-    print(f"Field name detected: '{field_name}'")
-    print(f"Info object: {json.dumps(event.get('info', {}), default=str)}")
+    logger.info("Field name detected: '%s'", field_name)
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug("Info object: %s", json.dumps(event.get('info', {}), default=str))
     
-    # Get table name from environment
+    # Get table name and worker queue from environment
     table_name = os.environ.get('DYNAMODB_TABLE_NAME')
-    print(f"Table name: {table_name}")
+    queue_url = os.environ.get('JOB_QUEUE_URL')
+    logger.debug("Table name: %s", table_name)
     
     if field_name == 'startEarthAccessJob':
         try:
-            print("Starting async job...")
+            logger.info("Starting async job...")
             # Quick response - create job and return ID
             job_id = str(uuid.uuid4())
             date_str = event['arguments']['date']
             lat = event['arguments']['lat']
             lon = event['arguments']['long']
             timezone = event['arguments']['timezone']
+            years_back = event['arguments'].get('yearsBack')
+            if years_back is None:
+                years_back = DEFAULT_YEARS_BACK
+            years_back = validate_years_back(date_str, years_back)
             
-            print(f"Job ID: {job_id}, Date: {date_str}, Lat: {lat}, Lon: {lon}")
+            logger.info("Job ID: %s, Date: %s, Lat: %s, Lon: %s", job_id, date_str, lat, lon)
             
             # Create job record in DynamoDB
             if not table_name:
                 raise ValueError("DYNAMODB_TABLE_NAME environment variable not set")
+            if not queue_url:
+                raise ValueError("JOB_QUEUE_URL environment variable not set")
             
-            table = dynamodb.Table(table_name)
-            table.put_item(Item={
-                'jobId': job_id,
-                'status': 'pending',
-                'lat': Decimal(str(lat)),
-                'long': Decimal(str(lon)),
-                'date': date_str,
-                'timezone': timezone,
-                'createdAt': datetime.utcnow().isoformat()
-            })
-            print(f"Created DynamoDB record for job {job_id}")
+            table = _table(table_name)
+            # The job record and the queued worker message are independent, so
+            # issue both at once and wait for the two round trips together
+            put_future = _request_executor.submit(
+                table.put_item,
+                Item={
+                    'jobId': job_id,
+                    'status': 'pending',
+                    'lat': Decimal(str(lat)),
+                    'long': Decimal(str(lon)),
+                    'date': date_str,
+                    'timezone': timezone,
+                    'yearsBack': years_back,
+                    'createdAt': _utc_timestamp()
+                },
+                ConditionExpression='attribute_not_exists(jobId)'
+            )
             
-            # Invoke Lambda asynchronously to process data
-            response = lambda_client.invoke(
-                FunctionName=context.function_name,
-                InvocationType='Event',  # Async invocation
-                Payload=json.dumps({
+            # Queue the job for the worker (this function's SQS event source)
+            send_future = _request_executor.submit(
+                sqs_client.send_message,
+                QueueUrl=queue_url,
+                MessageBody=json.dumps({
                     'processJob': True,
                     'jobId': job_id,
                     'date': date_str,
                     'lat': lat,
                     'long': lon,
                     'timezone': timezone,
+                    'yearsBack': years_back,
                     'tableName': table_name
                 })
             )
-            print(f"Async Lambda invocation response: {response['StatusCode']}")
+            put_future.result()
+            logger.debug("Created DynamoDB record for job %s", job_id)
+            response = send_future.result()
+            logger.debug("Queued job message %s", response['MessageId'])
             
             return job_id
         except Exception as e:
-            print(f"Error in startEarthAccessJob: {str(e)}")
-            import traceback
-            traceback.print_exc()
+            logger.exception("Error in startEarthAccessJob: %s", e)
             raise
     
     elif field_name == 'getEarthAccessJobStatus':
         try:
-            print("Getting job status...")
+            logger.debug("Getting job status...")
             # Query job status from DynamoDB
             job_id = event['arguments']['jobId']
             
             if not table_name:
                 raise ValueError("DYNAMODB_TABLE_NAME environment variable not set")
             
-            table = dynamodb.Table(table_name)
+            table = _table(table_name)
             response = table.get_item(Key={'jobId': job_id})
             
             if 'Item' not in response:
-                print(f"Job {job_id} not found")
+                logger.info("Job %s not found", job_id)
                 return {
                     'status': 'not_found',
                     'error': 'Job not found'
                 }
             
             item = response['Item']
-            print(f"Job {job_id} status: {item.get('status')}")
+            logger.info("Job %s status: %s", job_id, item.get('status'))
             
             # Convert Decimal values to float for JSON serialization
             result = convert_decimals_to_float(item.get('result'))
@@ -308,65 +794,59 @@ def handler(event, context):
                 'completedAt': item.get('completedAt')
             }
         except Exception as e:
-            print(f"Error in getEarthAccessJobStatus: {str(e)}")
-            import traceback
-            traceback.print_exc()
+            logger.exception("Error in getEarthAccessJobStatus: %s", e)
             raise
     
-    elif event.get('processJob'):
-        # This is the async worker invocation
-        print(f"Processing job asynchronously: {event.get('jobId')}")
-        process_earth_data(
-            event['jobId'],
-            event['date'],
-            event['lat'],
-            event['long'],
-            event['timezone'],
-            event['tableName']
-        )
+    elif event.get('Records'):
+        # Queued worker messages delivered by the SQS event sources
+        dead_letter_queue_arn = os.environ.get('JOB_DEAD_LETTER_QUEUE_ARN')
+        for record in event['Records']:
+            if record.get('eventSourceARN') == dead_letter_queue_arn:
+                try:
+                    process_dead_letter(json.loads(record['body']))
+                except JobFailedError:
+                    logger.exception("Dead-letter message %s failed its job", record.get('messageId'))
+                except Exception:
+                    # Last resort: the DLQ has no queue behind it, so a re-raised
+                    # error would be redelivered until the message expires
+                    logger.exception("Dropping dead-letter message %s", record.get('messageId'))
+                continue
+            try:
+                process_worker_message(json.loads(record['body']), queue_url)
+            except JobFailedError:
+                # The failure is recorded on the job, so don't let SQS redeliver
+                # the message. Anything else is re-raised for SQS to retry and
+                # eventually dead-letter.
+                logger.exception("Worker message %s failed", record.get('messageId'))
+        return {'status': 'processed'}
+    
+    elif event.get('processJob') or event.get('processYear'):
+        # Direct worker invocation
+        process_worker_message(event, queue_url)
         return {'status': 'processed'}
     
     else:
         # Original synchronous handler (for backward compatibility)
-        print("Using synchronous handler (earthaccess query)")
-        print(f"Arguments: {json.dumps(event.get('arguments', {}), default=str)}")
+        logger.info("Using synchronous handler (earthaccess query)")
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("Arguments: %s", json.dumps(event.get('arguments', {}), default=str))
         
         # Check if this is actually a synchronous earthaccess call
         if 'arguments' not in event or 'date' not in event.get('arguments', {}):
             raise ValueError(f"Unknown query type or missing arguments. Field name: '{field_name}', Event keys: {list(event.keys())}")
         
-        earthaccess.login(strategy='environment')
+        trim_cache()
+        _ensure_login()
         
         date_str = event['arguments']['date']
         lat = event['arguments']['lat']
         lon = event['arguments']['long']
         timezone = event['arguments']['timezone']
-        variables = [
-            'T2M',      # 2-meter air temperature (K)
-            'PS',       # Surface pressure (Pa)
-            'QV2M',     # 2-meter specific humidity (kg/kg)
-            'U2M',      # 2-meter eastward wind (m/s)
-            'V2M'       # 2-meter northward wind (m/s)
-        ]
 
         # Reduced to 2 years to stay within API Gateway 30-second timeout
-        all_datasets = pull_multi_year_data(date_str, lat, lon, keep_variables=variables, years_back=2)
-        all_hourly_data = []
-        for i, ds in enumerate(all_datasets):
-            hourly_data = extract_hourly_averages(ds)
-            all_hourly_data.append(hourly_data)
-
-        # Average across years for each variable
-        averaged_hourly_data = {}
-        for var in all_hourly_data[0].keys():
-            arrays = [data[var] for data in all_hourly_data]
-            stacked = np.stack(arrays)
-            averaged_hourly_data[var] = np.mean(stacked, axis=0)
-
-        noon_hour_index = 12
-        noon_data = {}
-        for var, values in averaged_hourly_data.items():
-            noon_data[var] = str(values[noon_hour_index])
+        all_noon_values = pull_multi_year_data(date_str, lat, lon, keep_variables=VARIABLES, years_back=2)
+        noon = average_noon_values(all_noon_values, VARIABLES)
+        noon_data = {var: str(value) for var, value in zip(VARIABLES, noon)}
 
         return {
           "statusCode": 200,
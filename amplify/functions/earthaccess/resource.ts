@@ -2,7 +2,7 @@
 import * as path from "node:path";
 import { fileURLToPath } from "node:url";
 import { defineFunction } from "@aws-amplify/backend";
-import { Duration } from "aws-cdk-lib";
+import { Duration, Size } from "aws-cdk-lib";
 import { DockerImageFunction, DockerImageCode, Architecture } from "aws-cdk-lib/aws-lambda";
 import { Platform } from "aws-cdk-lib/aws-ecr-assets";
 import * as secretsmanager from "aws-cdk-lib/aws-secretsmanager";
@@ -29,6 +29,8 @@ export const earthaccessFunctionHandler = defineFunction(
       architecture: Architecture.X86_64,
       memorySize: 4096,
       timeout: Duration.seconds(240),
+      // /tmp holds the fsspec block cache; index.py caps it at half of this
+      ephemeralStorageSize: Size.mebibytes(2048),
       environment: {
         EARTHDATA_USERNAME: usernameSecret.secretValue.unsafeUnwrap(),
         EARTHDATA_PASSWORD: passwordSecret.secretValue.unsafeUnwrap(),
@@ -39,7 +41,7 @@ export const earthaccessFunctionHandler = defineFunction(
     usernameSecret.grantRead(fn);
     passwordSecret.grantRead(fn);
     
-    // Self-invoke permission will be added in backend.ts to avoid circular dependency
+    // Job queue and its event source are added in backend.ts to avoid circular dependency
 
     return fn;
   },